@@ -0,0 +1,210 @@
+import tenseal as ts
+import numpy as np
+import time
+
+import codec
+
+# Batched layout: one ciphertext per embedding dimension and one slot per pair. With
+# poly_modulus_degree=8192 each ciphertext has 4096 slots, so 128 ciphertexts per side
+# hold up to 4096 probe/reference pairs, and the server sums the dimension ciphertexts
+# into a single ciphertext of per-pair squared distances without any slot rotation.
+# A batch costs 128 ciphertexts per side however few pairs it holds, so batches with
+# fewer pairs than dimensions fall back to one CKKS vector per embedding.
+EMBEDDING_SIZE = 128
+POLY_MODULUS_DEGREE = 8192
+DISTANCE_THRESHOLD = 10
+
+def flatten_embedding(embedding):
+    """
+    Flatten the output of DeepFace.represent into a float64 array.
+
+    Parameters:
+        embedding (list): The list of faces returned by DeepFace.represent.
+
+    Returns:
+        numpy.ndarray: The embedding values of the first face.
+    """
+    return codec.embedding_to_array(embedding)[:EMBEDDING_SIZE]
+
+def pairs_per_batch(poly_modulus_degree=POLY_MODULUS_DEGREE):
+    """
+    Number of pairs verified per batch of dimension ciphertexts, one per slot.
+
+    Parameters:
+        poly_modulus_degree (int): The poly_modulus_degree of the CKKS context.
+
+    Returns:
+        int: The slot count, poly_modulus_degree // 2.
+    """
+    return poly_modulus_degree // 2
+
+def use_batched_layout(num_pairs, embedding_size=EMBEDDING_SIZE, poly_modulus_degree=POLY_MODULUS_DEGREE):
+    """
+    Whether the batched layout is cheaper than one CKKS vector per embedding.
+
+    Parameters:
+        num_pairs (int): The number of pairs to verify.
+        embedding_size (int): The length of a single embedding.
+        poly_modulus_degree (int): The poly_modulus_degree of the context.
+
+    Returns:
+        bool: True when there are at least as many pairs as ciphertexts per side.
+    """
+    return embedding_size <= num_pairs <= pairs_per_batch(poly_modulus_degree)
+
+def client_encrypt_batch(context, embeddings, poly_modulus_degree=POLY_MODULUS_DEGREE, embedding_size=EMBEDDING_SIZE):
+    """
+    Encrypt a batch of embeddings with one ciphertext per dimension and one slot per embedding.
+
+    Parameters:
+        context (ts.Context): The CKKS context holding the secret key.
+        embeddings (numpy.ndarray): A (num_embeddings, embedding_size) array.
+        poly_modulus_degree (int): The poly_modulus_degree of the context.
+        embedding_size (int): The length of a single embedding.
+
+    Returns:
+        ts.CKKSTensor: A batched tensor of shape (embedding_size,).
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    if embeddings.ndim != 2 or embeddings.shape[1] != embedding_size:
+        raise ValueError(f"Expected embeddings of size {embedding_size}, got shape {embeddings.shape}.")
+
+    capacity = pairs_per_batch(poly_modulus_degree)
+    if len(embeddings) > capacity:
+        raise ValueError(f"Cannot batch {len(embeddings)} embeddings, a batch holds at most {capacity}.")
+
+    return ts.ckks_tensor(context, codec.encode_batch(embeddings), batch=True)
+
+def server_batch_squared_distances(enc_probes, enc_references):
+    """
+    Compute the squared euclidean distance of every pair in the batch.
+
+    One subtraction and one square per dimension ciphertext, then the dimension
+    ciphertexts are added up, leaving each pair's squared distance in its own slot.
+    Only the per-pair distances are returned to the key holder.
+
+    Parameters:
+        enc_probes (ts.CKKSTensor): The batched probe embeddings.
+        enc_references (ts.CKKSTensor): The batched reference embeddings, same order.
+
+    Returns:
+        ts.CKKSTensor: The encrypted squared distances, one slot per pair.
+    """
+    squared_diff = enc_probes - enc_references
+    squared_diff = squared_diff.square()
+    # Axis 0 of a batched tensor is the batch, i.e. the slots; the dimensions are axis 1
+    return squared_diff.sum(axis=1)
+
+def server_squared_distance(enc_probe, enc_reference):
+    """
+    Compute the squared euclidean distance of a single pair.
+
+    Parameters:
+        enc_probe (ts.CKKSVector): The encrypted probe embedding.
+        enc_reference (ts.CKKSVector): The encrypted reference embedding.
+
+    Returns:
+        ts.CKKSVector: The encrypted squared distance in slot 0.
+    """
+    squared_diff = enc_probe - enc_reference
+    return squared_diff.dot(squared_diff)
+
+def client_batch_distances(enc_squared_distances, num_pairs):
+    """
+    Decrypt the squared distances of a batch and take their square roots.
+
+    Parameters:
+        enc_squared_distances (ts.CKKSTensor): The result of server_batch_squared_distances,
+            linked to a context holding the secret key.
+        num_pairs (int): The number of pairs in the batch.
+
+    Returns:
+        numpy.ndarray: The euclidean distance of each pair.
+    """
+    return codec.euclidean_distance(codec.decrypt_batch(enc_squared_distances)[:num_pairs])
+
+def batch_verify(context, probes, references, threshold=DISTANCE_THRESHOLD,
+                 poly_modulus_degree=POLY_MODULUS_DEGREE, embedding_size=EMBEDDING_SIZE):
+    """
+    Verify many probe/reference pairs, as many pairs per batch as there are slots.
+
+    Chunks with fewer pairs than embedding dimensions, such as a short tail, are
+    verified one CKKS vector per embedding instead.
+
+    Parameters:
+        context (ts.Context): The CKKS context holding the secret key.
+        probes (numpy.ndarray): The (num_pairs, embedding_size) probe embeddings.
+        references (numpy.ndarray): The reference embeddings, aligned with probes.
+        threshold (float): Pairs closer than this are the same person.
+        poly_modulus_degree (int): The poly_modulus_degree of the context.
+        embedding_size (int): The length of a single embedding.
+
+    Returns:
+        tuple: (distances, same_person) arrays with one entry per pair.
+    """
+    probes = np.asarray(probes, dtype=np.float64)
+    references = np.asarray(references, dtype=np.float64)
+    if probes.shape != references.shape:
+        raise ValueError("probes and references must have the same shape.")
+
+    capacity = pairs_per_batch(poly_modulus_degree)
+    distances = []
+
+    for start in range(0, len(probes), capacity):
+        probe_chunk = probes[start:start + capacity]
+        reference_chunk = references[start:start + capacity]
+
+        if use_batched_layout(len(probe_chunk), embedding_size, poly_modulus_degree):
+            # Client side
+            enc_probes = client_encrypt_batch(context, probe_chunk, poly_modulus_degree, embedding_size)
+            enc_references = client_encrypt_batch(context, reference_chunk, poly_modulus_degree, embedding_size)
+
+            # Server side
+            enc_squared_distances = server_batch_squared_distances(enc_probes, enc_references)
+
+            # Client side decryption
+            distances.append(client_batch_distances(enc_squared_distances, len(probe_chunk)))
+        else:
+            # Client side
+            enc_pairs = [(codec.encrypt(context, probe), codec.encrypt(context, reference))
+                         for probe, reference in zip(probe_chunk, reference_chunk)]
+
+            # Server side
+            enc_squared_distances = [server_squared_distance(enc_probe, enc_reference)
+                                     for enc_probe, enc_reference in enc_pairs]
+
+            # Client side decryption
+            squared_distances = np.array([codec.decrypt(enc)[0] for enc in enc_squared_distances])
+            distances.append(codec.euclidean_distance(squared_distances))
+
+    distances = np.concatenate(distances) if distances else np.empty(0)
+    return distances, codec.same_person(distances, threshold)
+
+if __name__ == "__main__":
+    from deepface import DeepFace
+
+    pairs = [
+        ("../downloads/alia1.jpg", "../downloads/alia2.jpg"),
+        ("../downloads/alia3.jpg", "../downloads/alia5.jpg"),
+        ("../downloads/IMG1.jpg", "../downloads/alia3.jpg"),
+    ]
+
+    print("===== Batched Facial Verification Using Homomorphic Encryption =====")
+
+    # Extract facial embeddings using DeepFace
+    probes = np.stack([flatten_embedding(DeepFace.represent(img1, model_name="Facenet")) for img1, _ in pairs])
+    references = np.stack([flatten_embedding(DeepFace.represent(img2, model_name="Facenet")) for _, img2 in pairs])
+
+    # Initialize encryption context
+    context = codec.make_context(POLY_MODULUS_DEGREE)
+
+    start_time = time.time()
+    distances, matches = batch_verify(context, probes, references)
+    elapsed_time = time.time() - start_time
+
+    for (img1, img2), distance, same_person in zip(pairs, distances, matches):
+        verdict = "same person" if same_person else "not same person"
+        print(f"{img1} vs {img2}: distance {distance:.3f} -> {verdict}")
+
+    print(f"Time elapsed for {len(pairs)} verifications: {elapsed_time:.5f} seconds.")
+    print("===== End of Batched Facial Verification =====")
@@ -0,0 +1,263 @@
+import tenseal as ts
+import argparse
+import math
+import random
+
+import batch_verify
+import codec
+
+# Precision and scale-budget instrumentation for the CKKS pipelines.
+#
+# Every homomorphic op is mirrored on a plaintext shadow copy. After each op the
+# ciphertext is decrypted and compared to the shadow, and the modulus level, the
+# scale and the remaining bit budget are recorded, so smaller parameters can be
+# checked against the error each pipeline can tolerate before adopting them.
+
+# The error each pipeline can absorb: voting rounds counts, face matching compares
+# sqrt(distance) < 10, so the squared distance should stay well inside one unit.
+VOTING_TOLERANCE = 0.5
+FACE_TOLERANCE = 1.0
+
+def ciphertext_scale(enc):
+    # CKKSVector.scale() calls a binding some TenSEAL releases (e.g. 0.3.18) do not ship,
+    # so read the scale off the underlying SEAL ciphertext instead
+    return enc.data.ciphertext()[0].scale
+
+class CKKSAudit:
+    """
+    Collects per-op measurements for one pipeline.
+
+    Parameters:
+        context (ts.Context): The CKKS context holding the secret key.
+        coeff_mod_bit_sizes (list): The coefficient modulus used to build the context.
+        pipeline (str): The name printed in the report.
+    """
+
+    def __init__(self, context, coeff_mod_bit_sizes, pipeline):
+        self.context = context
+        self.coeff_mod_bit_sizes = coeff_mod_bit_sizes
+        self.pipeline = pipeline
+        self.records = []
+
+    @property
+    def max_depth(self):
+        # The last prime is the special prime and the first one holds the final result
+        return len(self.coeff_mod_bit_sizes) - 2
+
+    def encrypt(self, values):
+        """
+        Encrypt values and start tracking them.
+
+        Parameters:
+            values (list): The plaintext values.
+
+        Returns:
+            TrackedVector: The tracked ciphertext.
+        """
+        tracked = TrackedVector(self, ts.ckks_vector(self.context, values), list(values), 0)
+        self.record("encrypt", tracked)
+        return tracked
+
+    def record(self, op, tracked):
+        self._append(op, tracked.enc.decrypt(), tracked.shadow, tracked.level, ciphertext_scale(tracked.enc))
+
+    def _append(self, op, decrypted, shadow, level, scale):
+        error = max((abs(d - s) for d, s in zip(decrypted, shadow)), default=0.0)
+        magnitude = max((abs(s) for s in shadow), default=0.0)
+
+        # Bits of ciphertext modulus left at this level, minus what the scaled values occupy
+        modulus_bits = sum(self.coeff_mod_bit_sizes[:len(self.coeff_mod_bit_sizes) - 1 - level])
+        scale_bits = math.log2(scale)
+        value_bits = math.log2(magnitude + 1)
+
+        self.records.append({
+            "op": op,
+            "level": level,
+            "levels_remaining": self.max_depth - level,
+            "scale_bits": scale_bits,
+            "headroom_bits": modulus_bits - scale_bits - value_bits,
+            "max_error": error,
+            "precision_bits": -math.log2(error) if error > 0 else float("inf"),
+        })
+
+    def max_error(self):
+        return max((r["max_error"] for r in self.records), default=0.0)
+
+    def report(self, tolerance=None):
+        """
+        Print the per-op measurements and the remaining budget of the pipeline.
+
+        Parameters:
+            tolerance (float): The absolute error the pipeline can absorb.
+        """
+        print(f"\n===== CKKS audit: {self.pipeline} =====")
+        print(f"{'op':<12}{'level':>6}{'left':>6}{'scale':>8}{'headroom':>10}{'max error':>12}{'bits':>7}")
+        records = self.records
+        if len(records) > 8:
+            # Keep the report readable: only the start and the end of a long pipeline
+            records = records[:4] + records[-4:]
+            print(f"({len(self.records) - 8} ops omitted)")
+        for r in records:
+            print(f"{r['op']:<12}{r['level']:>6}{r['levels_remaining']:>6}{r['scale_bits']:>8.1f}"
+                  f"{r['headroom_bits']:>10.1f}{r['max_error']:>12.2e}{r['precision_bits']:>7.1f}")
+
+        last = self.records[-1]
+        print(f"Remaining budget: {last['levels_remaining']} levels, {last['headroom_bits']:.1f} bits of headroom")
+        if tolerance is not None:
+            verdict = "OK" if self.max_error() < tolerance else "EXCEEDED"
+            print(f"Max error {self.max_error():.2e} against tolerance {tolerance}: {verdict}")
+
+class TrackedVector:
+    """
+    A CKKS vector paired with the plaintext it should decrypt to.
+
+    Parameters:
+        audit (CKKSAudit): The audit the ops are recorded to.
+        enc (ts.CKKSVector): The ciphertext.
+        shadow (list): The exact plaintext result.
+        level (int): The number of rescales consumed so far.
+    """
+
+    def __init__(self, audit, enc, shadow, level):
+        self.audit = audit
+        self.enc = enc
+        self.shadow = shadow
+        self.level = level
+
+    def _derive(self, op, enc, shadow, level):
+        tracked = TrackedVector(self.audit, enc, shadow, level)
+        self.audit.record(op, tracked)
+        return tracked
+
+    def __add__(self, other):
+        if isinstance(other, TrackedVector):
+            shadow = [a + b for a, b in zip(self.shadow, other.shadow)]
+            return self._derive("add", self.enc + other.enc, shadow, max(self.level, other.level))
+        return self._derive("add_plain", self.enc + other, [a + other for a in self.shadow], self.level)
+
+    def __sub__(self, other):
+        if isinstance(other, TrackedVector):
+            shadow = [a - b for a, b in zip(self.shadow, other.shadow)]
+            return self._derive("sub", self.enc - other.enc, shadow, max(self.level, other.level))
+        return self._derive("sub_plain", self.enc - other, [a - other for a in self.shadow], self.level)
+
+    def __mul__(self, other):
+        if isinstance(other, TrackedVector):
+            shadow = [a * b for a, b in zip(self.shadow, other.shadow)]
+            return self._derive("mul", self.enc * other.enc, shadow, max(self.level, other.level) + 1)
+        return self._derive("mul_plain", self.enc * other, [a * other for a in self.shadow], self.level + 1)
+
+    def square(self):
+        return self._derive("square", self.enc.square(), [a * a for a in self.shadow], self.level + 1)
+
+    def sum(self):
+        return self._derive("sum", self.enc.sum(), [sum(self.shadow)], self.level)
+
+    def dot(self, other):
+        shadow = [sum(a * b for a, b in zip(self.shadow, other.shadow))]
+        return self._derive("dot", self.enc.dot(other.enc), shadow, max(self.level, other.level) + 1)
+
+def tracked_sum(vectors, op):
+    """
+    Add tracked vectors together, recording a single row for the whole reduction.
+
+    Parameters:
+        vectors (list): The TrackedVectors to add, all recorded to the same audit.
+        op (str): The name of the row.
+
+    Returns:
+        TrackedVector: The sum.
+    """
+    enc = vectors[0].enc
+    shadow = list(vectors[0].shadow)
+    for vector in vectors[1:]:
+        enc = enc + vector.enc
+        shadow = [a + b for a, b in zip(shadow, vector.shadow)]
+    return vectors[0]._derive(op, enc, shadow, max(vector.level for vector in vectors))
+
+def audit_voting(context, coeff_mod_bit_sizes, num_voters, rng):
+    """
+    Replay the tally of server_count_votes in voting.py for one candidate.
+
+    Parameters:
+        context (ts.Context): The CKKS context holding the secret key.
+        coeff_mod_bit_sizes (list): The coefficient modulus of the context.
+        num_voters (int): The number of ballots to sum.
+        rng (random.Random): The random generator for the ballots.
+
+    Returns:
+        CKKSAudit: The audit of the pipeline.
+    """
+    audit = CKKSAudit(context, coeff_mod_bit_sizes, f"voting tally ({num_voters} voters)")
+
+    candidate_sum = audit.encrypt([0])
+    for _ in range(num_voters):
+        candidate_sum = candidate_sum + audit.encrypt([rng.randint(0, 1)])
+    return audit
+
+def audit_face(context, coeff_mod_bit_sizes, rng):
+    """
+    Replay the squared euclidean distance of facial_reco.py on random embeddings.
+
+    Parameters:
+        context (ts.Context): The CKKS context holding the secret key.
+        coeff_mod_bit_sizes (list): The coefficient modulus of the context.
+        rng (random.Random): The random generator for the embeddings.
+
+    Returns:
+        CKKSAudit: The audit of the pipeline.
+    """
+    audit = CKKSAudit(context, coeff_mod_bit_sizes, "face distance")
+
+    enc_v1 = audit.encrypt([rng.gauss(0.0, 1.0) for _ in range(batch_verify.EMBEDDING_SIZE)])
+    enc_v2 = audit.encrypt([rng.gauss(0.0, 1.0) for _ in range(batch_verify.EMBEDDING_SIZE)])
+    diff = enc_v1 - enc_v2
+    diff.dot(diff)
+    return audit
+
+def audit_batch_verify(context, coeff_mod_bit_sizes, poly_modulus_degree, rng):
+    """
+    Replay the batched distance of batch_verify.py on a full batch of random embeddings.
+
+    A batched CKKS tensor holds one ciphertext per dimension with one slot per pair,
+    so each dimension is replayed as a CKKS vector of batch size.
+
+    Parameters:
+        context (ts.Context): The CKKS context holding the secret key.
+        coeff_mod_bit_sizes (list): The coefficient modulus of the context.
+        poly_modulus_degree (int): The poly_modulus_degree of the context.
+        rng (random.Random): The random generator for the embeddings.
+
+    Returns:
+        CKKSAudit: The audit of the pipeline.
+    """
+    audit = CKKSAudit(context, coeff_mod_bit_sizes, "batched face distance")
+
+    num_pairs = batch_verify.pairs_per_batch(poly_modulus_degree)
+    squared_diffs = []
+    for _ in range(batch_verify.EMBEDDING_SIZE):
+        enc_probes = audit.encrypt([rng.gauss(0.0, 1.0) for _ in range(num_pairs)])
+        enc_references = audit.encrypt([rng.gauss(0.0, 1.0) for _ in range(num_pairs)])
+        squared_diffs.append((enc_probes - enc_references).square())
+
+    # The server adds the dimension ciphertexts up, one squared distance per slot
+    tracked_sum(squared_diffs, "sum_dims")
+    return audit
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure CKKS error and scale budget of each pipeline.")
+    parser.add_argument("--poly-modulus-degree", type=int, default=8192)
+    parser.add_argument("--coeff-mod-bit-sizes", type=int, nargs="+", default=[60, 40, 40, 60])
+    parser.add_argument("--scale-bits", type=int, default=40)
+    parser.add_argument("--voters", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    context = codec.make_context(args.poly_modulus_degree, args.coeff_mod_bit_sizes, args.scale_bits)
+    print(f"Parameters: poly_modulus_degree={args.poly_modulus_degree}, "
+          f"coeff_mod_bit_sizes={args.coeff_mod_bit_sizes}, scale=2**{args.scale_bits}")
+
+    audit_voting(context, args.coeff_mod_bit_sizes, args.voters, rng).report(VOTING_TOLERANCE)
+    audit_face(context, args.coeff_mod_bit_sizes, rng).report(FACE_TOLERANCE)
+    audit_batch_verify(context, args.coeff_mod_bit_sizes, args.poly_modulus_degree, rng).report(FACE_TOLERANCE)
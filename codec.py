@@ -0,0 +1,145 @@
+import tenseal as ts
+import numpy as np
+
+# NumPy encode/decode boundary for the CKKS pipelines.
+#
+# Embeddings enter as float64 arrays and decrypted tallies and distances leave as arrays,
+# so rounding, square roots and thresholds are vectorized instead of per-element Python.
+# Encoding defaults to TenSEAL; callers on another backend with the same API, such as
+# face.py and facial_reco.py with ckks_demo, pass their module as backend.
+
+def make_context(poly_modulus_degree=8192, coeff_mod_bit_sizes=(60, 40, 40, 60), scale_bits=40, backend=ts):
+    """
+    Create a CKKS context with galois keys, holding the secret key.
+
+    Parameters:
+        poly_modulus_degree (int): The ring size; half of it is the slot count.
+        coeff_mod_bit_sizes (list): The bit size of each prime of the coefficient modulus.
+        scale_bits (int): The global scale is 2**scale_bits.
+        backend (module): The CKKS library the context is created with.
+
+    Returns:
+        ts.Context: The context.
+    """
+    context = backend.context(backend.SCHEME_TYPE.CKKS, poly_modulus_degree=poly_modulus_degree,
+                              coeff_mod_bit_sizes=list(coeff_mod_bit_sizes))
+    context.generate_galois_keys()
+    context.global_scale = 2**scale_bits
+    return context
+
+def embedding_to_array(embedding):
+    """
+    Convert the output of DeepFace.represent into a float64 array.
+
+    Parameters:
+        embedding (list): The list of faces returned by DeepFace.represent.
+
+    Returns:
+        numpy.ndarray: The embedding values of all faces, back to back.
+    """
+    return np.concatenate([np.asarray(list(face.values())[0], dtype=np.float64) for face in embedding])
+
+def encode(values, backend=ts):
+    """
+    Encode an array as a CKKS plain tensor.
+
+    Parameters:
+        values (numpy.ndarray): The values to encode; anything array-like is converted
+            to float64, a float64 array is used as is.
+        backend (module): The CKKS library the plain tensor is built with.
+
+    Returns:
+        ts.PlainTensor: The plain tensor.
+    """
+    return backend.plain_tensor(np.asarray(values, dtype=np.float64).ravel(), dtype="float")
+
+def encrypt(context, values, backend=ts):
+    """
+    Encrypt an array into a CKKS vector.
+
+    Parameters:
+        context (ts.Context): The CKKS context, created with backend.
+        values (numpy.ndarray): The values to encrypt.
+        backend (module): The CKKS library of the context.
+
+    Returns:
+        ts.CKKSVector: The encrypted vector.
+    """
+    return backend.ckks_vector(context, encode(values, backend))
+
+def encode_batch(values, backend=ts):
+    """
+    Encode a 2-D array as a CKKS plain tensor for batched encryption.
+
+    Parameters:
+        values (numpy.ndarray): A (batch, dim) array; the first axis goes into the slots.
+        backend (module): The CKKS library the plain tensor is built with.
+
+    Returns:
+        ts.PlainTensor: The plain tensor.
+    """
+    return backend.plain_tensor(np.asarray(values, dtype=np.float64))
+
+def decrypt(enc_vector):
+    """
+    Decrypt a CKKS vector into a float64 array.
+
+    Parameters:
+        enc_vector (ts.CKKSVector): The vector, of any backend, linked to a context holding
+            the secret key.
+
+    Returns:
+        numpy.ndarray: The decrypted values.
+    """
+    return np.asarray(enc_vector.decrypt(), dtype=np.float64)
+
+def decrypt_batch(enc_tensor):
+    """
+    Decrypt a batched CKKS tensor into a float64 array.
+
+    Parameters:
+        enc_tensor (ts.CKKSTensor): The tensor, linked to a context holding the secret key.
+
+    Returns:
+        numpy.ndarray: The decrypted values, flattened.
+    """
+    # TenSEAL exposes no buffer to decrypted values; raw is its flat row-major list,
+    # which skips building the nested lists of tolist()
+    return np.array(enc_tensor.decrypt().raw, dtype=np.float64)
+
+def round_counts(values):
+    """
+    Round approximate CKKS counts to integers.
+
+    Parameters:
+        values (numpy.ndarray): The decrypted counts.
+
+    Returns:
+        numpy.ndarray: The counts as int64.
+    """
+    return np.rint(values).astype(np.int64)
+
+def euclidean_distance(squared_distance):
+    """
+    Take the square root of decrypted squared distances.
+
+    Parameters:
+        squared_distance (numpy.ndarray): The decrypted squared distances.
+
+    Returns:
+        numpy.ndarray: The euclidean distances.
+    """
+    return np.sqrt(np.maximum(squared_distance, 0.0))
+
+def same_person(distances, threshold):
+    """
+    Threshold euclidean distances.
+
+    Parameters:
+        distances (numpy.ndarray): The euclidean distances.
+        threshold (float): Distances below this are the same person.
+
+    Returns:
+        numpy.ndarray: A boolean per distance.
+    """
+    return np.asarray(distances) < threshold
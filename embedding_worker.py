@@ -0,0 +1,164 @@
+from deepface import DeepFace
+import numpy as np
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Long-lived DeepFace embedding worker.
+#
+# The Facenet model and the face detector are loaded and warmed up once when the worker
+# starts, so the first probe does not pay for model loading, graph building or tracing.
+# Requests are queued and served one at a time, in order, by a single background thread;
+# DeepFace.represent embeds one image per call, so there is nothing to gain from batching.
+
+class EmbeddingWorker:
+    """
+    Serve DeepFace.represent requests one at a time from a queue with preloaded models.
+
+    Parameters:
+        model_name (str): The DeepFace recognition model.
+        detector_backend (str): The DeepFace face detector.
+    """
+
+    def __init__(self, model_name="Facenet", detector_backend="opencv"):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+
+        self.requests = queue.Queue()
+        self.ready = threading.Event()
+        self.thread = None
+        self.startup_error = None
+
+        # Guards stopping and the stop sentinel, so no request is queued behind it
+        self.lock = threading.Lock()
+        self.stopping = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Start the worker thread and block until the models are loaded and warmed up.
+        """
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+        if self.startup_error is not None:
+            # The thread has exited; forget it so submit() refuses work and start() can retry
+            self.thread.join()
+            self.thread = None
+            self.ready.clear()
+            error, self.startup_error = self.startup_error, None
+            raise RuntimeError("Embedding worker failed to start") from error
+
+    def stop(self):
+        """
+        Serve the requests already queued, then stop the worker thread.
+        """
+        with self.lock:
+            if self.thread is None or self.stopping:
+                return
+            self.stopping = True
+            self.requests.put(None)
+
+        self.thread.join()
+        with self.lock:
+            self.thread = None
+            self.stopping = False
+
+    def submit(self, img):
+        """
+        Queue an embedding request.
+
+        Parameters:
+            img (str or numpy.ndarray): An image path or a BGR image array.
+
+        Returns:
+            Future: Resolves to the DeepFace.represent result for img.
+        """
+        future = Future()
+        with self.lock:
+            if self.thread is None or self.stopping:
+                raise RuntimeError("Embedding worker is not running, call start() first")
+            self.requests.put((img, future))
+        return future
+
+    def represent(self, img, timeout=None):
+        """
+        Embed an image, a drop-in replacement for DeepFace.represent.
+
+        Parameters:
+            img (str or numpy.ndarray): An image path or a BGR image array.
+            timeout (float): Seconds to wait for the result, None to wait forever.
+
+        Returns:
+            list: The DeepFace.represent result.
+        """
+        return self.submit(img).result(timeout)
+
+    def _represent(self, img, enforce_detection=True):
+        return DeepFace.represent(img, model_name=self.model_name, detector_backend=self.detector_backend,
+                                  enforce_detection=enforce_detection)
+
+    def _warm_up(self):
+        # DeepFace caches built models, so loading them here keeps them for the life of
+        # the process; a first forward pass on a blank frame also traces the graph and
+        # builds the detector
+        DeepFace.build_model(self.model_name)
+        blank = np.zeros((160, 160, 3), dtype=np.uint8)
+        self._represent(blank, enforce_detection=False)
+
+    def _run(self):
+        try:
+            self._warm_up()
+        except Exception as e:
+            self.startup_error = e
+            self.ready.set()
+            return
+        self.ready.set()
+
+        while True:
+            item = self.requests.get()
+            if item is None:
+                # Stop request: submit() queues nothing behind it, this is only a safeguard
+                self._drain()
+                return
+
+            img, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._represent(img))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _drain(self):
+        while True:
+            try:
+                item = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RuntimeError("Embedding worker stopped"))
+
+if __name__ == "__main__":
+    images = ["../downloads/alia1.jpg", "../downloads/alia2.jpg", "../downloads/alia3.jpg"]
+
+    print("Loading and warming up models...")
+    start_time = time.time()
+    with EmbeddingWorker() as worker:
+        print(f"Worker ready in {time.time() - start_time:.3f} seconds.")
+
+        for img in images:
+            start_time = time.time()
+            worker.represent(img)
+            print(f"{img}: embedded in {time.time() - start_time:.3f} seconds.")
@@ -1,7 +1,8 @@
 import ckks_demo as ts
 from deepface import DeepFace
 import base64
-import math
+
+import codec
 
 # Common functions for writing and reading data
 
@@ -63,17 +64,13 @@ del context, secret_context, public_context
 
 # Encryption
 
-# Flatten the list of embedding values
-img1_embedding_values_flat = [list(face.values())[0] for face in img1_embedding]
-img2_embedding_values_flat = [list(face.values())[0] for face in img2_embedding]
-
-# Flatten the nested list
-img1_embedding_values_flat = [val for sublist in img1_embedding_values_flat for val in sublist]
-img2_embedding_values_flat = [val for sublist in img2_embedding_values_flat for val in sublist]
+# Flatten the embedding values into float64 arrays
+img1_embedding_values_flat = codec.embedding_to_array(img1_embedding)
+img2_embedding_values_flat = codec.embedding_to_array(img2_embedding)
 
 # Create plain tensors
-plain_tensor1 = ts.plain_tensor(img1_embedding_values_flat, dtype="float")
-plain_tensor2 = ts.plain_tensor(img2_embedding_values_flat, dtype="float")
+plain_tensor1 = codec.encode(img1_embedding_values_flat, backend=ts)
+plain_tensor2 = codec.encode(img2_embedding_values_flat, backend=ts)
 
 # Load secret key context
 context = ts.context_from(read_data('secret.txt'))
@@ -122,7 +119,7 @@ euclidean_squared = ts.lazy_ckks_vector_from(read_data(file_name="euclidean_squa
 euclidean_squared.link_context(context)
 
 # Decrypt and compute euclidean distance
-euclidean_dist = math.sqrt(euclidean_squared.decrypt()[0])
+euclidean_dist = codec.euclidean_distance(codec.decrypt(euclidean_squared)[0])
 
 # Output result
 if euclidean_dist < 10:
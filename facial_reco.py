@@ -1,19 +1,27 @@
 import ckks_demo as ts
 from deepface import DeepFace
 import base64
-import math
 import time
 
+import codec
+import compact_io
+
 # Common functions for writing and reading data
 
-def write_data(file_name, file_content):
+def write_data(file_name, file_content, compression=None):
     """
     Write data to a file.
 
     Parameters:
         file_name (str): The name of the file.
         file_content (bytes): The content to be written to the file.
+        compression (str): Write a compact artifact with this compact_io codec
+            ("raw", "zlib" or "zstd") instead of base64, None for base64.
     """
+    if compression is not None:
+        compact_io.write_compact(file_name, file_content, compression)
+        return
+
     if type(file_content) == bytes:
         # Convert bytes to base64
         file_content = base64.b64encode(file_content)
@@ -23,7 +31,7 @@ def write_data(file_name, file_content):
 
 def read_data(file_name):
     """
-    Read data from a file.
+    Read data from a file written by write_data, with or without compression.
 
     Parameters:
         file_name (str): The name of the file.
@@ -31,45 +39,51 @@ def read_data(file_name):
     Returns:
         bytes: The content read from the file.
     """
-    with open(file_name, 'rb') as f:
-        file_content = f.read()
+    return compact_io.read_compact(file_name)
+
+def client_server_model(img1_path, img2_path, worker=None, compression=None):
+    """
+    Run the client/server facial recognition flow on two images.
 
-    return base64.b64decode(file_content)
+    Parameters:
+        img1_path (str): The path of the first image.
+        img2_path (str): The path of the second image.
+        worker (EmbeddingWorker): A started embedding worker with the models already
+            loaded, or None to call DeepFace.represent directly.
+        compression (dict): The compact_io codec of each artifact, keyed by "secret",
+            "public", "vector" and "result"; artifacts left out are written as base64.
+    """
+    compression = compression or {}
+    represent = worker.represent if worker is not None else lambda img: DeepFace.represent(img, model_name="Facenet")
 
-def client_server_model(img1_path, img2_path):
     print("===== Facial Recognition Using Homomorphic Encryption =====")
 
     # Client side
     print("\nClient: Initiating facial recognition process...")
 
     # Extract facial embeddings using DeepFace for image 1
-    img1_embedding = DeepFace.represent(img1_path, model_name="Facenet")
+    img1_embedding = represent(img1_path)
 
     # Extract facial embeddings using DeepFace for image 2
-    img2_embedding = DeepFace.represent(img2_path, model_name="Facenet")
+    img2_embedding = represent(img2_path)
 
     # Initialize encryption context
-    context = ts.context(ts.SCHEME_TYPE.CKKS, poly_modulus_degree=8192, coeff_mod_bit_sizes=[60, 40, 40, 60])
-    context.generate_galois_keys()
-    context.global_scale = 2**40
+    context = codec.make_context(backend=ts)
 
     # Serialize and save secret key
     secret_context = context.serialize(save_secret_key=True)
-    write_data(file_name='secret.txt', file_content=secret_context)
+    write_data(file_name='secret.txt', file_content=secret_context, compression=compression.get('secret'))
 
     # Make context public and serialize
     context.make_context_public()
     public_context = context.serialize()
-    write_data(file_name='public.txt', file_content=public_context)
+    write_data(file_name='public.txt', file_content=public_context, compression=compression.get('public'))
 
     # Cleanup
     del context, secret_context, public_context
 
     # Encryption for image 1
-    img1_embedding_values_flat = [list(face.values())[0] for face in img1_embedding]
-    img1_embedding_values_flat = [val for sublist in img1_embedding_values_flat for val in sublist]
-
-    plain_tensor1 = ts.plain_tensor(img1_embedding_values_flat, dtype="float")
+    plain_tensor1 = codec.encode(codec.embedding_to_array(img1_embedding), backend=ts)
 
     # Load secret key context
     context = ts.context_from(read_data('secret.txt'))
@@ -79,17 +93,14 @@ def client_server_model(img1_path, img2_path):
     print("Client: Vector for image 1 encrypted.")
 
     # Serialize and save encrypted vector for image 1
-    write_data(file_name="enc_vector1.txt", file_content=enc_vector1.serialize())
+    write_data(file_name="enc_vector1.txt", file_content=enc_vector1.serialize(), compression=compression.get('vector'))
     print("Client: Encrypted vector for image 1 saved.")
 
     # Cleanup
     del context, enc_vector1
 
     # Encryption for image 2
-    img2_embedding_values_flat = [list(face.values())[0] for face in img2_embedding]
-    img2_embedding_values_flat = [val for sublist in img2_embedding_values_flat for val in sublist]
-
-    plain_tensor2 = ts.plain_tensor(img2_embedding_values_flat, dtype="float")
+    plain_tensor2 = codec.encode(codec.embedding_to_array(img2_embedding), backend=ts)
 
     # Load secret key context
     context = ts.context_from(read_data('secret.txt'))
@@ -99,7 +110,7 @@ def client_server_model(img1_path, img2_path):
     print("Client: Vector for image 2 encrypted.")
 
     # Serialize and save encrypted vector for image 2
-    write_data(file_name="enc_vector2.txt", file_content=enc_vector2.serialize())
+    write_data(file_name="enc_vector2.txt", file_content=enc_vector2.serialize(), compression=compression.get('vector'))
     print("Client: Encrypted vector for image 2 saved.")
 
     # Cleanup
@@ -124,7 +135,7 @@ def client_server_model(img1_path, img2_path):
     euclidean_squared = euclidean_squared.dot(euclidean_squared)
 
     # Serialize and save result
-    write_data(file_name="euclidean_squared.txt", file_content=euclidean_squared.serialize())
+    write_data(file_name="euclidean_squared.txt", file_content=euclidean_squared.serialize(), compression=compression.get('result'))
 
     # Cleanup
     del context, enc_vector1, enc_vector2, euclidean_squared
@@ -148,7 +159,7 @@ def client_server_model(img1_path, img2_path):
     start_time = time.time()
 
     # Decrypt and compute Euclidean distance
-    euclidean_dist = math.sqrt(euclidean_squared.decrypt()[0])
+    euclidean_dist = codec.euclidean_distance(codec.decrypt(euclidean_squared)[0])
 
     # Calculate the elapsed time
     elapsed_time = time.time() - start_time
@@ -0,0 +1,419 @@
+import tenseal as ts
+import argparse
+import base64
+import math
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import codec
+import compact_io
+import voting
+import batch_verify
+
+# Synthetic load generator for the voting and face-matching flows.
+#
+# Ballots and embeddings are generated at random, pushed through the same client and
+# server steps as voting.py and facial_reco.py, and exchanged in memory as the payloads
+# write_data would put on disk, so their length is the number of bytes on the wire.
+
+def wire(data, compression=None):
+    """
+    Encode a serialized object the way write_data stores it.
+
+    Parameters:
+        data (bytes): The serialized object.
+        compression (str): The compact_io codec, None for base64.
+
+    Returns:
+        bytes: The encoded payload.
+    """
+    if compression is not None:
+        return compact_io.pack(data, compression)
+    return base64.b64encode(data)
+
+def unwire(payload):
+    """
+    Decode a payload produced by wire.
+
+    Parameters:
+        payload (bytes): The encoded payload.
+
+    Returns:
+        bytes: The serialized object.
+    """
+    if compact_io.is_compact(payload):
+        return compact_io.unpack(payload)
+    return base64.b64decode(payload)
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+
+    Parameters:
+        sorted_values (list): The values, sorted ascending.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in megabytes.
+
+    Returns:
+        float: The peak RSS (ru_maxrss is in kilobytes on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class LoadStats:
+    """
+    Thread-safe collector for per-request latencies and bytes on the wire.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = 0
+
+    def record(self, latency, bytes_sent, bytes_received):
+        with self.lock:
+            self.latencies.append(latency)
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def report(self, name, elapsed_time, items_per_request=1):
+        """
+        Print throughput, latency percentiles, peak RSS and bytes on the wire.
+
+        Parameters:
+            name (str): The name of the scenario.
+            elapsed_time (float): The wall-clock duration of the run in seconds.
+            items_per_request (int): Verifications or ballots covered by one request.
+        """
+        latencies = sorted(self.latencies)
+        completed = len(latencies)
+
+        print(f"\n===== Load test: {name} =====")
+        print(f"Requests completed: {completed} ({self.errors} errors) in {elapsed_time:.3f} seconds")
+        if elapsed_time > 0:
+            print(f"Throughput: {completed / elapsed_time:.2f} requests/s, "
+                  f"{completed * items_per_request / elapsed_time:.2f} items/s")
+        print(f"Latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms, "
+              f"p95: {percentile(latencies, 0.95) * 1000:.2f} ms, "
+              f"p99: {percentile(latencies, 0.99) * 1000:.2f} ms")
+        print(f"Bytes on the wire: {self.bytes_sent} sent, {self.bytes_received} received")
+        if completed:
+            print(f"Bytes per request: {(self.bytes_sent + self.bytes_received) / completed:.0f}")
+        print(f"Peak RSS: {peak_rss_mb():.1f} MB")
+
+def run_load(request_fn, num_requests, num_clients, rate, stats):
+    """
+    Drive request_fn from num_clients concurrent clients.
+
+    Parameters:
+        request_fn (callable): Called as request_fn(client_index, request_index), returns
+            (bytes_sent, bytes_received).
+        num_requests (int): The total number of requests.
+        num_clients (int): The number of concurrent simulated clients.
+        rate (float): Target requests per second across all clients, 0 for as fast as possible.
+        stats (LoadStats): Collector for the results.
+
+    Returns:
+        float: The wall-clock duration of the run in seconds.
+    """
+    start_time = time.perf_counter()
+
+    def worker(client_index):
+        for request_index in range(client_index, num_requests, num_clients):
+            if rate > 0:
+                # Open-loop schedule: request i is due at start_time + i / rate
+                delay = start_time + request_index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            request_start = time.perf_counter()
+            try:
+                bytes_sent, bytes_received = request_fn(client_index, request_index)
+            except Exception as e:
+                print(f"Request {request_index} failed: {e}")
+                stats.record_error()
+                continue
+            stats.record(time.perf_counter() - request_start, bytes_sent, bytes_received)
+
+    with ThreadPoolExecutor(max_workers=num_clients) as executor:
+        list(executor.map(worker, range(num_clients)))
+
+    return time.perf_counter() - start_time
+
+# Face matching
+
+def make_client_context(compression=None):
+    """
+    Create the secret and public contexts of one simulated face-matching client.
+
+    Parameters:
+        compression (str): The compact_io codec of the public context, None for base64.
+
+    Returns:
+        tuple: (secret context, public context payload as sent to the server).
+    """
+    context = codec.make_context()
+
+    public_context = context.copy()
+    public_context.make_context_public()
+
+    return context, wire(public_context.serialize(), compression)
+
+def random_embeddings(rng, count, size=batch_verify.EMBEDDING_SIZE):
+    """
+    Generate random embeddings with roughly the spread of a Facenet embedding.
+
+    Parameters:
+        rng (numpy.random.Generator): The random generator.
+        count (int): The number of embeddings.
+        size (int): The length of each embedding.
+
+    Returns:
+        numpy.ndarray: A (count, size) float64 array.
+    """
+    return rng.standard_normal((count, size))
+
+def open_session(public_payload):
+    """
+    Server side of a client session: load the public context the client sent once.
+
+    Parameters:
+        public_payload (bytes): The client's public context as sent to the server.
+
+    Returns:
+        ts.Context: The public context, reused for every request of the session.
+    """
+    return ts.context_from(unwire(public_payload))
+
+def face_request(secret_context, server_context, probes, references, batched, compression=None):
+    """
+    Run one client -> server -> client face-matching round trip within a session.
+
+    Parameters:
+        secret_context (ts.Context): The client context holding the secret key.
+        server_context (ts.Context): The public context the server loaded in open_session.
+        probes (numpy.ndarray): The (num_pairs, embedding_size) probe embeddings.
+        references (numpy.ndarray): The reference embeddings.
+        batched (bool): Verify all pairs as one batch instead of one ciphertext pair per pair;
+            requests with fewer pairs than embedding dimensions are still sent per pair.
+        compression (str): The compact_io codec of every payload, None for base64.
+
+    Returns:
+        tuple: (bytes sent by the client, bytes received by the client).
+    """
+    batched = batched and batch_verify.use_batched_layout(len(probes))
+
+    # Client side encryption
+    if batched:
+        enc_probes = [batch_verify.client_encrypt_batch(secret_context, probes)]
+        enc_references = [batch_verify.client_encrypt_batch(secret_context, references)]
+    else:
+        enc_probes = [codec.encrypt(secret_context, probe) for probe in probes]
+        enc_references = [codec.encrypt(secret_context, reference) for reference in references]
+
+    request = [(wire(p.serialize(), compression), wire(r.serialize(), compression))
+               for p, r in zip(enc_probes, enc_references)]
+    bytes_sent = sum(len(p) + len(r) for p, r in request)
+
+    # Batches travel as CKKS tensors, single pairs as CKKS vectors
+    load = ts.lazy_ckks_tensor_from if batched else ts.lazy_ckks_vector_from
+
+    # Server side
+    context = server_context
+    response = []
+    for probe_payload, reference_payload in request:
+        enc_probe = load(unwire(probe_payload))
+        enc_reference = load(unwire(reference_payload))
+        enc_probe.link_context(context)
+        enc_reference.link_context(context)
+
+        if batched:
+            result = batch_verify.server_batch_squared_distances(enc_probe, enc_reference)
+        else:
+            result = batch_verify.server_squared_distance(enc_probe, enc_reference)
+        response.append(wire(result.serialize(), compression))
+
+    bytes_received = sum(len(r) for r in response)
+
+    # Client side decryption
+    for payload in response:
+        result = load(unwire(payload))
+        result.link_context(secret_context)
+        if batched:
+            batch_verify.client_batch_distances(result, len(probes))
+        else:
+            codec.euclidean_distance(codec.decrypt(result)[0])
+
+    return bytes_sent, bytes_received
+
+def face_load_test(num_requests, num_clients, rate, pairs_per_request, batched, seed,
+                   compression=None):
+    """
+    Load test the face-matching flow with random embeddings.
+
+    Parameters:
+        num_requests (int): The total number of requests.
+        num_clients (int): The number of concurrent simulated clients.
+        rate (float): Target requests per second, 0 for as fast as possible.
+        pairs_per_request (int): Probe/reference pairs verified per request.
+        batched (bool): Use batch verification.
+        seed (int): Seed for the synthetic embeddings.
+        compression (str): The compact_io codec of every payload, None for base64.
+    """
+    if batched and pairs_per_request > batch_verify.pairs_per_batch():
+        raise ValueError(f"At most {batch_verify.pairs_per_batch()} pairs fit in one batch.")
+
+    rng = np.random.default_rng(seed)
+
+    # Key generation is per client and happens once, outside the measured window
+    contexts = [make_client_context(compression) for _ in range(num_clients)]
+
+    # Each client sends its public context, galois keys included, once per session;
+    # it is reported separately so it does not dominate the per-request numbers
+    sessions = []
+    session_times = []
+    for _, public_payload in contexts:
+        start_time = time.perf_counter()
+        sessions.append(open_session(public_payload))
+        session_times.append(time.perf_counter() - start_time)
+
+    # Pre-generate the workload so the generator does not show up in the latencies
+    workload = [(random_embeddings(rng, pairs_per_request), random_embeddings(rng, pairs_per_request))
+                for _ in range(num_requests)]
+
+    def request_fn(client_index, request_index):
+        secret_context, _ = contexts[client_index]
+        probes, references = workload[request_index]
+        return face_request(secret_context, sessions[client_index], probes, references, batched, compression)
+
+    stats = LoadStats()
+    elapsed_time = run_load(request_fn, num_requests, num_clients, rate, stats)
+    mode = "batched" if batched and batch_verify.use_batched_layout(pairs_per_request) else "per pair"
+    mode += f", {compression or 'base64'}"
+    stats.report(f"face matching ({mode}, {pairs_per_request} pairs/request)", elapsed_time, pairs_per_request)
+
+    session_bytes = sum(len(public_payload) for _, public_payload in contexts)
+    print(f"Session setup: {num_clients} public context(s), {session_bytes} bytes sent, "
+          f"{sum(session_times) / num_clients * 1000:.2f} ms to load on the server per session")
+
+# Voting
+
+def synthetic_ballots(num_voters, num_candidates, rng):
+    """
+    Generate random ballots.
+
+    Parameters:
+        num_voters (int): The number of ballots.
+        num_candidates (int): The number of candidates.
+        rng (random.Random): The random generator.
+
+    Returns:
+        list: The 1-based candidate chosen on each ballot.
+    """
+    return [rng.randint(1, num_candidates) for _ in range(num_voters)]
+
+def encrypt_ballots(ballots, candidates):
+    """
+    Encrypt ballots in the layout client_voting in voting.py produces.
+
+    Parameters:
+        ballots (list): The 1-based candidate chosen on each ballot.
+        candidates (list): The candidate names.
+
+    Returns:
+        dict: The encrypted one-hot votes per candidate.
+    """
+    encrypted_votes = {candidate: [] for candidate in candidates}
+    for vote in ballots:
+        for i, candidate in enumerate(candidates):
+            encrypted_votes[candidate].append(ts.ckks_vector(voting.context, [1 if i == vote - 1 else 0]))
+    return encrypted_votes
+
+def voting_load_test(num_elections, num_clients, rate, num_voters, num_candidates, seed):
+    """
+    Load test the voting flow with synthetic elections.
+
+    Parameters:
+        num_elections (int): The total number of elections to run.
+        num_clients (int): The number of concurrent simulated clients.
+        rate (float): Target elections per second, 0 for as fast as possible.
+        num_voters (int): Ballots per election.
+        num_candidates (int): Candidates per election.
+        seed (int): Seed for the synthetic ballots.
+    """
+    rng = random.Random(seed)
+    candidates = [f"Candidate{i + 1}" for i in range(num_candidates)]
+    elections = [synthetic_ballots(num_voters, num_candidates, rng) for _ in range(num_elections)]
+
+    def request_fn(client_index, request_index):
+        ballots = elections[request_index]
+
+        # Client side
+        encrypted_votes = encrypt_ballots(ballots, candidates)
+        bytes_sent = sum(len(wire(vote.serialize())) for votes in encrypted_votes.values() for vote in votes)
+
+        # Server side
+        counts = voting.server_count_votes(encrypted_votes, candidates)
+
+        expected = [ballots.count(i + 1) for i in range(num_candidates)]
+        if [int(counts[candidate].sum()) for candidate in candidates] != expected:
+            raise ValueError(f"Tally mismatch, expected {expected}")
+
+        # server_count_votes decrypts on the server, so only the rounded counts travel back,
+        # sent as one int64 per candidate in candidate order
+        tally = np.concatenate([counts[candidate] for candidate in candidates]).astype(np.int64)
+        bytes_received = len(wire(tally.tobytes()))
+        return bytes_sent, bytes_received
+
+    stats = LoadStats()
+    elapsed_time = run_load(request_fn, num_elections, num_clients, rate, stats)
+    stats.report(f"voting ({num_voters} voters, {num_candidates} candidates)", elapsed_time, num_voters)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic load test for the homomorphic encryption apps.")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    face_parser = subparsers.add_parser("face", help="Face matching with random embeddings")
+    face_parser.add_argument("--requests", type=int, default=100)
+    face_parser.add_argument("--pairs", type=int, default=1, help="Pairs verified per request")
+    face_parser.add_argument("--batched", action="store_true", help="Verify all pairs of a request as one batch")
+    face_parser.add_argument("--compression", choices=list(compact_io.CODECS), help="Send compact payloads instead of base64")
+
+    voting_parser = subparsers.add_parser("voting", help="Voting with random ballots")
+    voting_parser.add_argument("--elections", type=int, default=10)
+    voting_parser.add_argument("--voters", type=int, default=100)
+    voting_parser.add_argument("--candidates", type=int, default=5)
+
+    for sub in (face_parser, voting_parser):
+        sub.add_argument("--clients", type=int, default=1, help="Concurrent simulated clients")
+        sub.add_argument("--rate", type=float, default=0, help="Target requests per second, 0 for unthrottled")
+        sub.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.scenario == "face":
+        face_load_test(args.requests, args.clients, args.rate, args.pairs, args.batched, args.seed,
+                       args.compression)
+    else:
+        voting_load_test(args.elections, args.clients, args.rate, args.voters, args.candidates, args.seed)
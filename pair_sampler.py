@@ -0,0 +1,159 @@
+import os
+import random
+
+import tensorflow as tf
+
+from siamese_train import preprocess, preprocess_twin
+
+# Streaming pair sampler for Siamese training.
+#
+# Images are read lazily from arbitrarily large directory trees through bounded shuffle
+# buffers instead of materialized file lists, positive and negative pairs are drawn in
+# equal numbers, and a pool of hard negatives (the negatives the current embedding model
+# places closest to their anchor) is mined periodically and mixed into the negative pairs.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def iter_images(root):
+    """
+    Walk a directory tree lazily, yielding image paths.
+
+    Parameters:
+        root (str): The directory to walk.
+
+    Yields:
+        str: The path of each image under root.
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield entry.path
+
+class StreamBuffer:
+    """
+    Random draws from an endless stream of image paths through a fixed-size buffer.
+
+    Each draw returns a random buffered path and replaces it with the next path from
+    the stream, so memory stays bounded by buffer_size whatever the size of the tree.
+    The tree is walked again from the top once it is exhausted.
+
+    Parameters:
+        root (str): The directory to sample from.
+        buffer_size (int): The number of paths kept in memory.
+        rng (random.Random): The random generator.
+    """
+
+    def __init__(self, root, buffer_size, rng):
+        self.root = root
+        self.buffer_size = buffer_size
+        self.rng = rng
+        self.stream = self._cycle()
+        self.buffer = []
+
+    def _cycle(self):
+        while True:
+            found = False
+            for path in iter_images(self.root):
+                found = True
+                yield path
+            if not found:
+                raise ValueError(f"No images found under {self.root}")
+
+    def draw(self):
+        while len(self.buffer) < self.buffer_size:
+            self.buffer.append(next(self.stream))
+
+        i = self.rng.randrange(self.buffer_size)
+        path = self.buffer[i]
+        self.buffer[i] = next(self.stream)
+        return path
+
+class PairSampler:
+    """
+    Balanced (anchor, validation, label) pairs with periodic hard-negative mining.
+
+    Parameters:
+        anchor_dir (str): The anchor images.
+        positive_dir (str): Images of the same person as the anchors.
+        negative_dir (str): Images of other people.
+        buffer_size (int): Paths kept in memory per directory.
+        hard_fraction (float): Share of negative pairs drawn from the mined pool.
+        seed (int): Seed for the random draws.
+    """
+
+    def __init__(self, anchor_dir, positive_dir, negative_dir, buffer_size=1024, hard_fraction=0.5, seed=None):
+        self.rng = random.Random(seed)
+        self.anchors = StreamBuffer(anchor_dir, buffer_size, self.rng)
+        self.positives = StreamBuffer(positive_dir, buffer_size, self.rng)
+        self.negatives = StreamBuffer(negative_dir, buffer_size, self.rng)
+        self.hard_fraction = hard_fraction
+        self.hard_pairs = []
+
+    def pairs(self):
+        """
+        Yield pairs forever, alternating positive and negative labels.
+
+        Yields:
+            tuple: (anchor path, validation path, label).
+        """
+        while True:
+            yield self.anchors.draw(), self.positives.draw(), 1.0
+
+            if self.hard_pairs and self.rng.random() < self.hard_fraction:
+                anchor, negative = self.rng.choice(self.hard_pairs)
+                yield anchor, negative, 0.0
+            else:
+                yield self.anchors.draw(), self.negatives.draw(), 0.0
+
+    def as_dataset(self, pairs_per_epoch):
+        """
+        Wrap the sampler in a preprocessed tf.data pipeline.
+
+        Parameters:
+            pairs_per_epoch (int): Pairs per pass over the dataset.
+
+        Returns:
+            tf.data.Dataset: The (anchor image, validation image, label) pairs.
+        """
+        data = tf.data.Dataset.from_generator(
+            self.pairs,
+            output_signature=(
+                tf.TensorSpec(shape=(), dtype=tf.string),
+                tf.TensorSpec(shape=(), dtype=tf.string),
+                tf.TensorSpec(shape=(), dtype=tf.float32),
+            ))
+        data = data.take(pairs_per_epoch)
+        return data.map(preprocess_twin, num_parallel_calls=tf.data.AUTOTUNE)
+
+    def mine_hard_negatives(self, embedding, num_candidates=512, keep=128, batch_size=64):
+        """
+        Refresh the hard-negative pool with the current embedding model.
+
+        Draws num_candidates (anchor, negative) pairs, embeds both sides and keeps the
+        pairs with the smallest L1 distance, i.e. the negatives the model confuses most.
+
+        Parameters:
+            embedding (tf.keras.Model): The embedding model of the Siamese network.
+            num_candidates (int): Candidate pairs scored per refresh.
+            keep (int): Size of the hard-negative pool.
+            batch_size (int): Images embedded per forward pass.
+        """
+        candidates = [(self.anchors.draw(), self.negatives.draw()) for _ in range(num_candidates)]
+
+        distances = []
+        for start in range(0, num_candidates, batch_size):
+            chunk = candidates[start:start + batch_size]
+            anchors = tf.stack([preprocess(anchor) for anchor, _ in chunk])
+            negatives = tf.stack([preprocess(negative) for _, negative in chunk])
+
+            anchor_embedding = embedding(anchors, training=False)
+            negative_embedding = embedding(negatives, training=False)
+            distance = tf.reduce_mean(tf.math.abs(anchor_embedding - negative_embedding), axis=1)
+            distances.extend(distance.numpy().tolist())
+
+        ranked = sorted(zip(distances, candidates), key=lambda item: item[0])
+        self.hard_pairs = [pair for _, pair in ranked[:keep]]
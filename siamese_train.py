@@ -0,0 +1,363 @@
+import os
+import time
+import argparse
+
+import tensorflow as tf
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import Layer, Conv2D, Dense, MaxPooling2D, Input, Flatten
+
+# Data-parallel training of the Siamese network from main.ipynb.
+#
+# The model definition is the notebook's. Training runs under a tf.distribute strategy
+# (one replica per GPU, or per logical CPU device when --cpu-replicas is given), the
+# train step is compiled with tf.function, gradients can be accumulated over several
+# batches, mixed precision is enabled on GPUs and checkpoints are written asynchronously.
+
+# Setup paths
+POS_PATH = os.path.join('data', 'positive')
+NEG_PATH = os.path.join('data', 'negative')
+ANC_PATH = os.path.join('data', 'anchor')
+
+def preprocess(file_path):
+
+    # Read in image from file path
+    byte_img = tf.io.read_file(file_path)
+    # Load in the image
+    img = tf.io.decode_jpeg(byte_img)
+
+    # Preprocessing steps - resizing the image to be 100x100x3
+    img = tf.image.resize(img, (100,100))
+    # Scale image to be between 0 and 1
+    img = img / 255.0
+
+    # Return image
+    return img
+
+def preprocess_twin(input_img, validation_img, label):
+    return(preprocess(input_img), preprocess(validation_img), label)
+
+def make_dataset(take=300):
+    """
+    Build the (anchor, positive/negative, label) dataset the way the notebook does.
+
+    Parameters:
+        take (int): The number of files taken from each directory.
+
+    Returns:
+        tf.data.Dataset: The shuffled, preprocessed pairs.
+    """
+    anchor = tf.data.Dataset.list_files(ANC_PATH + '/*.jpg').take(take)
+    positive = tf.data.Dataset.list_files(POS_PATH + '/*.jpg').take(take)
+    negative = tf.data.Dataset.list_files(NEG_PATH + '/*.jpg').take(take)
+
+    # (anchor, positive) => 1,1,1,1,1
+    # (anchor, negative) => 0,0,0,0,0
+    positives = tf.data.Dataset.zip((anchor, positive, tf.data.Dataset.from_tensor_slices(tf.ones(len(anchor)))))
+    negatives = tf.data.Dataset.zip((anchor, negative, tf.data.Dataset.from_tensor_slices(tf.zeros(len(anchor)))))
+    data = positives.concatenate(negatives)
+
+    # Build dataloader pipeline
+    data = data.map(preprocess_twin, num_parallel_calls=tf.data.AUTOTUNE)
+    data = data.cache()
+    data = data.shuffle(buffer_size=1024)
+    return data
+
+def make_embedding():
+    inp = Input(shape=(100,100,3), name='input_image')
+
+    # First block
+    c1 = Conv2D(64, (10,10), activation='relu')(inp)
+    m1 = MaxPooling2D(64, (2,2), padding='same')(c1)
+
+    # Second block
+    c2 = Conv2D(128, (7,7), activation='relu')(m1)
+    m2 = MaxPooling2D(64, (2,2), padding='same')(c2)
+
+    # Third block
+    c3 = Conv2D(128, (4,4), activation='relu')(m2)
+    m3 = MaxPooling2D(64, (2,2), padding='same')(c3)
+
+    # Final embedding block
+    c4 = Conv2D(256, (4,4), activation='relu')(m3)
+    f1 = Flatten()(c4)
+    d1 = Dense(4096, activation='sigmoid')(f1)
+
+    return Model(inputs=[inp], outputs=[d1], name='embedding')
+
+# Siamese L1 Distance class
+class L1Dist(Layer):
+
+    # Init method - inheritance
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    # Magic happens here - similarity calculation
+    def call(self, input_embedding, validation_embedding):
+        return tf.math.abs(input_embedding - validation_embedding)
+
+def make_siamese_model(embedding):
+
+    # Anchor image input in the network
+    input_image = Input(name='input_img', shape=(100,100,3))
+
+    # Validation image in the network
+    validation_image = Input(name='validation_img', shape=(100,100,3))
+
+    # Combine siamese distance components
+    siamese_layer = L1Dist(name='distance')
+    distances = siamese_layer(embedding(input_image), embedding(validation_image))
+
+    # Classification layer, kept in float32 so the sigmoid is stable under mixed precision
+    classifier = Dense(1, activation='sigmoid', dtype='float32')(distances)
+
+    return Model(inputs=[input_image, validation_image], outputs=classifier, name='SiameseNetwork')
+
+def make_strategy(cpu_replicas=0):
+    """
+    Pick the distribution strategy.
+
+    Must be called before any other TensorFlow op, since splitting the CPU into
+    logical devices is only possible before the runtime is initialized.
+
+    Parameters:
+        cpu_replicas (int): Split the CPU into this many replicas, 0 to use the GPUs
+            (or the single default device when there are none).
+
+    Returns:
+        tf.distribute.Strategy: The strategy to train under.
+    """
+    if cpu_replicas > 1:
+        cpu = tf.config.list_physical_devices('CPU')[0]
+        tf.config.set_logical_device_configuration(
+            cpu, [tf.config.LogicalDeviceConfiguration() for _ in range(cpu_replicas)])
+        return tf.distribute.MirroredStrategy([f'/cpu:{i}' for i in range(cpu_replicas)])
+
+    if len(tf.config.list_physical_devices('GPU')) > 1:
+        return tf.distribute.MirroredStrategy()
+
+    return tf.distribute.get_strategy()
+
+def enable_mixed_precision():
+    """
+    Switch Keras to mixed_float16 when a GPU is available.
+
+    Returns:
+        bool: Whether mixed precision was enabled.
+    """
+    if not tf.config.list_physical_devices('GPU'):
+        print("Mixed precision needs a GPU, training in float32.")
+        return False
+
+    tf.keras.mixed_precision.set_global_policy('mixed_float16')
+    return True
+
+class Trainer:
+    """
+    Compiled, distributed training loop for the Siamese model.
+
+    Parameters:
+        strategy (tf.distribute.Strategy): The strategy to train under.
+        global_batch_size (int): The batch size of the dataset passed to train.
+        accumulation_steps (int): Batches whose gradients are summed before each update.
+        mixed_precision (bool): Wrap the optimizer for loss scaling.
+        checkpoint_dir (str): Where checkpoints are written.
+        learning_rate (float): The Adam learning rate.
+    """
+
+    def __init__(self, strategy, global_batch_size, accumulation_steps=1, mixed_precision=False,
+                 checkpoint_dir='./training_checkpoints', learning_rate=1e-4):
+        self.strategy = strategy
+        self.global_batch_size = global_batch_size
+        self.accumulation_steps = accumulation_steps
+        self.mixed_precision = mixed_precision
+
+        with strategy.scope():
+            self.embedding = make_embedding()
+            self.siamese_model = make_siamese_model(self.embedding)
+
+            self.opt = tf.keras.optimizers.Adam(learning_rate)
+            if mixed_precision:
+                self.opt = tf.keras.mixed_precision.LossScaleOptimizer(self.opt)
+
+            # Per-example losses, averaged over the global batch in replica_step
+            self.binary_cross_loss = tf.losses.BinaryCrossentropy(reduction='none')
+
+            # Replica-local gradient sums, combined across replicas by apply_gradients
+            self.accumulators = [
+                tf.Variable(tf.zeros_like(v), trainable=False,
+                            synchronization=tf.VariableSynchronization.ON_READ,
+                            aggregation=tf.VariableAggregation.SUM)
+                for v in self.siamese_model.trainable_variables
+            ] if accumulation_steps > 1 else []
+
+        # establish checkpoints
+        self.checkpoint_prefix = os.path.join(checkpoint_dir, 'ckpt')
+        self.checkpoint = tf.train.Checkpoint(opt=self.opt, siamese_model=self.siamese_model)
+        try:
+            self.checkpoint_options = tf.train.CheckpointOptions(experimental_enable_async_checkpoint=True)
+        except TypeError:
+            # Async checkpointing needs TF >= 2.12
+            print("Async checkpoints are not supported by this TensorFlow, saving synchronously.")
+            self.checkpoint_options = None
+
+    def scale_loss(self, loss):
+        if not self.mixed_precision:
+            return loss
+        if hasattr(self.opt, 'get_scaled_loss'):
+            # Keras 2
+            return self.opt.get_scaled_loss(loss)
+        # Keras 3 (TF >= 2.16)
+        return self.opt.scale_loss(loss)
+
+    def unscale_gradients(self, grad):
+        # The Keras 3 LossScaleOptimizer unscales in apply_gradients; the loss scale
+        # only changes there, so accumulated gradients all share the same scale
+        if self.mixed_precision and hasattr(self.opt, 'get_unscaled_gradients'):
+            return self.opt.get_unscaled_gradients(grad)
+        return grad
+
+    def replica_step(self, batch):
+        # Get anchor and positive/negative image
+        X = batch[:2]
+        # Get label
+        y = tf.reshape(batch[2], (-1, 1))
+
+        # Record all of our operations
+        with tf.GradientTape() as tape:
+            # Forward pass
+            yhat = self.siamese_model(X, training=True)
+            # Calculate loss, averaged over every example that feeds one update
+            per_example_loss = self.binary_cross_loss(y, yhat)
+            loss = tf.nn.compute_average_loss(
+                per_example_loss, global_batch_size=self.global_batch_size * self.accumulation_steps)
+            scaled_loss = self.scale_loss(loss)
+
+        # Calculate gradients
+        variables = self.siamese_model.trainable_variables
+        grad = self.unscale_gradients(tape.gradient(scaled_loss, variables))
+
+        if self.accumulators:
+            for acc, g in zip(self.accumulators, grad):
+                acc.assign_add(g)
+        else:
+            # Calculate updated weights and apply to siamese model
+            self.opt.apply_gradients(zip(grad, variables))
+
+        return loss
+
+    def replica_apply(self):
+        self.opt.apply_gradients(zip([acc.read_value() for acc in self.accumulators],
+                                     self.siamese_model.trainable_variables))
+        for acc in self.accumulators:
+            acc.assign(tf.zeros_like(acc))
+
+    @tf.function
+    def train_step(self, batch):
+        per_replica_loss = self.strategy.run(self.replica_step, args=(batch,))
+        return self.strategy.reduce(tf.distribute.ReduceOp.SUM, per_replica_loss, axis=None)
+
+    @tf.function
+    def apply_step(self):
+        self.strategy.run(self.replica_apply)
+
+    def save_checkpoint(self):
+        # With async checkpoints this returns once the values are copied off the
+        # training devices, and the write happens in the background
+        if self.checkpoint_options is not None:
+            return self.checkpoint.save(file_prefix=self.checkpoint_prefix, options=self.checkpoint_options)
+        return self.checkpoint.save(file_prefix=self.checkpoint_prefix)
+
+    def train(self, data, EPOCHS, checkpoint_every=10, sampler=None, mine_every=1):
+        """
+        Train for EPOCHS epochs, reporting the loss and pairs/sec of each epoch.
+
+        Parameters:
+            data (tf.data.Dataset): Batched (anchor, validation, label) pairs.
+            EPOCHS (int): The number of epochs.
+            checkpoint_every (int): Save a checkpoint every this many epochs.
+            sampler (PairSampler): The sampler data was built from, to mine hard negatives.
+            mine_every (int): Refresh the hard negatives every this many epochs.
+        """
+        dist_data = self.strategy.experimental_distribute_dataset(data)
+
+        # Loop through epochs
+        for epoch in range(1, EPOCHS+1):
+            print('\n Epoch {}/{}'.format(epoch, EPOCHS))
+            progbar = tf.keras.utils.Progbar(None)
+
+            start_time = time.perf_counter()
+            pairs = 0
+            num_batches = 0
+            total_loss = 0.0
+
+            # Loop through each batch
+            for batch in dist_data:
+                # Run train step here
+                total_loss += float(self.train_step(batch))
+                num_batches += 1
+                if self.accumulators and num_batches % self.accumulation_steps == 0:
+                    self.apply_step()
+                pairs += self.global_batch_size
+                progbar.update(num_batches)
+
+            if num_batches == 0:
+                raise ValueError("The epoch produced no batches: the dataset has fewer pairs than one "
+                                 f"global batch of {self.global_batch_size}.")
+
+            # Flush a partial accumulation so no batch is dropped at the end of the epoch
+            if self.accumulators and num_batches % self.accumulation_steps != 0:
+                self.apply_step()
+
+            elapsed_time = time.perf_counter() - start_time
+            print(f"loss: {total_loss * self.accumulation_steps / num_batches:.4f}, "
+                  f"throughput: {pairs / elapsed_time:.1f} pairs/sec")
+
+            # Mine hard negatives with the model as trained so far, used from the next epoch on
+            if sampler is not None and epoch % mine_every == 0:
+                sampler.mine_hard_negatives(self.embedding)
+
+            # Save checkpoints
+            if epoch % checkpoint_every == 0:
+                self.save_checkpoint()
+
+        # Make sure the last background write is on disk before returning
+        if self.checkpoint_options is not None:
+            self.checkpoint.sync()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Siamese network.")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16, help="Global batch size across replicas")
+    parser.add_argument("--accumulation-steps", type=int, default=1)
+    parser.add_argument("--mixed-precision", action="store_true")
+    parser.add_argument("--cpu-replicas", type=int, default=0)
+    parser.add_argument("--checkpoint-dir", default='./training_checkpoints')
+    parser.add_argument("--stream", action="store_true", help="Sample pairs from the image directories with hard-negative mining")
+    parser.add_argument("--pairs-per-epoch", type=int, default=600)
+    parser.add_argument("--mine-every", type=int, default=1, help="Epochs between hard-negative refreshes")
+    args = parser.parse_args()
+
+    strategy = make_strategy(args.cpu_replicas)
+    mixed_precision = enable_mixed_precision() if args.mixed_precision else False
+    print(f"Training on {strategy.num_replicas_in_sync} replica(s)")
+
+    if args.stream:
+        from pair_sampler import PairSampler
+
+        sampler = PairSampler(ANC_PATH, POS_PATH, NEG_PATH)
+        train_data = sampler.as_dataset(args.pairs_per_epoch)
+    else:
+        sampler = None
+        data = make_dataset()
+
+        # Training partition
+        train_data = data.take(round(len(data)*.7))
+
+    train_data = train_data.batch(args.batch_size, drop_remainder=True)
+    train_data = train_data.prefetch(tf.data.AUTOTUNE)
+
+    trainer = Trainer(strategy, args.batch_size, args.accumulation_steps, mixed_precision, args.checkpoint_dir)
+    trainer.train(train_data, args.epochs, sampler=sampler, mine_every=args.mine_every)
+
+    # Save weights
+    trainer.siamese_model.save('siamesemodelv2.h5')
@@ -2,6 +2,8 @@ import random
 import os
 import tenseal as ts
 
+import codec
+
 # Setup TenSEAL context
 context = ts.context(
     ts.SCHEME_TYPE.CKKS,
@@ -65,14 +67,14 @@ def server_count_votes(encrypted_votes, candidates):
 
     # Round the decrypted count for each candidate
     for candidate, count in candidate_counts.items():
-        candidate_counts[candidate] = [round(value) for value in count.decrypt()]
+        candidate_counts[candidate] = codec.round_counts(codec.decrypt(count))
 
     return candidate_counts
 
 
 def client_display_results(encrypted_counts, candidates):
     # Decrypt the counts and round to the nearest integer
-    decrypted_counts = {candidate: [round(value) for value in count] for candidate, count in encrypted_counts.items()}
+    decrypted_counts = {candidate: codec.round_counts(count) for candidate, count in encrypted_counts.items()}
 
     # Display the decrypted counts
     print("\nClient: Decrypted counts:")
@@ -80,8 +82,8 @@ def client_display_results(encrypted_counts, candidates):
         print(f"{candidate}: {count} votes")
 
     # Find the winner index
-    winner_index = max(decrypted_counts, key=lambda k: sum(decrypted_counts[k]))
-    winner_votes = sum(decrypted_counts[winner_index])
+    winner_index = max(decrypted_counts, key=lambda k: decrypted_counts[k].sum())
+    winner_votes = decrypted_counts[winner_index].sum()
     print(f"\nClient: Announcing the winner...")
     print(f"The winner is {winner_index} with {winner_votes} votes.")
 